@@ -1,64 +1,130 @@
 import pandas as pd
 import pytz
 import pytest
+from pytest import approx
 
 from qstrader.broker.portfolio.portfolio import Portfolio
 from qstrader.broker.portfolio.portfolio_event import PortfolioEvent
 from qstrader.broker.transaction.transaction import Transaction
 
 
-def test_initial_settings_for_default_portfolio():
+UTC = pytz.UTC
+
+START_DT = pd.Timestamp('2017-10-05 08:00:00', tz=UTC)
+EARLIER_DT = pd.Timestamp('2017-10-04 08:00:00', tz=UTC)
+LATER_DT = pd.Timestamp('2017-10-06 08:00:00', tz=UTC)
+EVEN_LATER_DT = pd.Timestamp('2017-10-07 08:00:00', tz=UTC)
+ASSET1_DT = pd.Timestamp('2017-10-06 08:00:00', tz=UTC)
+ASSET2_DT = pd.Timestamp('2017-10-07 08:00:00', tz=UTC)
+UPDATE_DT = pd.Timestamp('2017-10-08 08:00:00', tz=UTC)
+
+REL_TOL = 1e-9
+
+
+def _sub_event(dt, credit, balance):
+    return PortfolioEvent(
+        dt=dt, type='subscription',
+        description="SUBSCRIPTION", debit=0.0,
+        credit=credit, balance=balance
+    )
+
+
+def _wdr_event(dt, debit, balance):
+    return PortfolioEvent(
+        dt=dt, type='withdrawal',
+        description="WITHDRAWAL", debit=debit,
+        credit=0.0, balance=balance
+    )
+
+
+LATER_SUB_EVENT = _sub_event(LATER_DT, 1000.0, 1000.0)
+
+
+def _assert_balances(port, cash, non_cash, equity):
+    assert port.cash == approx(cash, rel=REL_TOL)
+    assert port.total_market_value == approx(non_cash, rel=REL_TOL)
+    assert port.total_equity == approx(equity, rel=REL_TOL)
+
+
+def _tx(symbol, dt, price=567.0, qty=100, commission=15.78, order_id=1):
+    return Transaction(
+        asset=symbol, quantity=qty, dt=dt, price=price,
+        order_id=order_id, commission=commission
+    )
+
+
+@pytest.fixture(scope="module")
+def asset():
+    return 'EQ:AAA'
+
+
+@pytest.fixture(scope="module")
+def other_asset():
+    return 'EQ:BBB'
+
+
+@pytest.fixture
+def port():
+    return Portfolio(START_DT)
+
+
+@pytest.mark.parametrize(
+    "kwargs,expected",
+    [
+        (
+            {},
+            {
+                "start_dt": START_DT,
+                "current_dt": START_DT,
+                "currency": "USD",
+                "starting_cash": 0.0,
+                "portfolio_id": None,
+                "name": None,
+                "total_market_value": 0.0,
+                "cash": 0.0,
+                "total_equity": 0.0
+            }
+        ),
+        (
+            {
+                "starting_cash": 1234567.56,
+                "currency": "USD",
+                "portfolio_id": 12345,
+                "name": "My Second Test Portfolio"
+            },
+            {
+                "start_dt": START_DT,
+                "current_dt": START_DT,
+                "currency": "USD",
+                "starting_cash": 1234567.56,
+                "portfolio_id": 12345,
+                "name": "My Second Test Portfolio",
+                "total_market_value": 0.0,
+                "cash": 1234567.56,
+                "total_equity": 1234567.56
+            }
+        )
+    ]
+)
+def test_initial_settings_for_default_portfolio(kwargs, expected):
     """
     Test that the initial settings are as they should be
-    for two specified portfolios.
+    for a default Portfolio and one with keyword arguments.
     """
-    start_dt = pd.Timestamp('2017-10-05 08:00:00', tz=pytz.UTC)
-
-    # Test a default Portfolio
-    port1 = Portfolio(start_dt)
-    assert port1.start_dt == start_dt
-    assert port1.current_dt == start_dt
-    assert port1.currency == "USD"
-    assert port1.starting_cash == 0.0
-    assert port1.portfolio_id is None
-    assert port1.name is None
-    assert port1.total_market_value == 0.0
-    assert port1.cash == 0.0
-    assert port1.total_equity == 0.0
-
-    # Test a Portfolio with keyword arguments
-    port2 = Portfolio(
-        start_dt, starting_cash=1234567.56, currency="USD",
-        portfolio_id=12345, name="My Second Test Portfolio"
-    )
-    assert port2.start_dt == start_dt
-    assert port2.current_dt == start_dt
-    assert port2.currency == "USD"
-    assert port2.starting_cash == 1234567.56
-    assert port2.portfolio_id == 12345
-    assert port2.name == "My Second Test Portfolio"
-    assert port2.total_equity == 1234567.56
-    assert port2.total_market_value == 0.0
-    assert port2.cash == 1234567.56
-
-
-def test_portfolio_currency_settings():
+    port = Portfolio(START_DT, **kwargs)
+    for attr, val in expected.items():
+        assert getattr(port, attr) == val
+
+
+@pytest.mark.parametrize("cur", ["USD", "GBP"])
+def test_portfolio_currency_settings(cur):
     """
     Test that USD and GBP currencies are correctly set with
     some currency keyword arguments and that the currency
     formatter produces the correct strings.
     """
-    start_dt = pd.Timestamp('2017-10-05 08:00:00', tz=pytz.UTC)
-
-    # Test a US portfolio produces correct values
-    cur1 = "USD"
-    port1 = Portfolio(start_dt, currency=cur1)
-    assert port1.currency == "USD"
-
-    # Test a UK portfolio produces correct values
-    cur2 = "GBP"
-    port2 = Portfolio(start_dt, currency=cur2)
-    assert port2.currency == "GBP"
+    port = Portfolio(START_DT, currency=cur)
+    assert port.currency == cur
 
 
 def test_subscribe_funds_behaviour():
@@ -68,42 +134,29 @@ def test_subscribe_funds_behaviour():
     Test subscribe_funds correctly adds positive
     amount, generates correct event and modifies time
     """
-    start_dt = pd.Timestamp('2017-10-05 08:00:00', tz=pytz.UTC)
-    earlier_dt = pd.Timestamp('2017-10-04 08:00:00', tz=pytz.UTC)
-    later_dt = pd.Timestamp('2017-10-06 08:00:00', tz=pytz.UTC)
     pos_cash = 1000.0
     neg_cash = -1000.0
-    port = Portfolio(start_dt, starting_cash=2000.0)
+    port = Portfolio(START_DT, starting_cash=2000.0)
 
     # Test subscribe_funds raises for incorrect datetime
     with pytest.raises(ValueError):
-        port.subscribe_funds(earlier_dt, pos_cash)
+        port.subscribe_funds(EARLIER_DT, pos_cash)
 
     # Test subscribe_funds raises for negative amount
     with pytest.raises(ValueError):
-        port.subscribe_funds(start_dt, neg_cash)
+        port.subscribe_funds(START_DT, neg_cash)
 
     # Test subscribe_funds correctly adds positive
     # amount, generates correct event and modifies time
-    port.subscribe_funds(later_dt, pos_cash)
+    port.subscribe_funds(LATER_DT, pos_cash)
 
-    assert port.cash == 3000.0
-    assert port.total_market_value == 0.0
-    assert port.total_equity == 3000.0
+    _assert_balances(port, 3000.0, 0.0, 3000.0)
 
-    pe1 = PortfolioEvent(
-        dt=start_dt, type='subscription',
-        description="SUBSCRIPTION", debit=0.0,
-        credit=2000.0, balance=2000.0
-    )
-    pe2 = PortfolioEvent(
-        dt=later_dt, type='subscription',
-        description="SUBSCRIPTION", debit=0.0,
-        credit=1000.0, balance=3000.0
-    )
+    pe1 = _sub_event(START_DT, 2000.0, 2000.0)
+    pe2 = _sub_event(LATER_DT, 1000.0, 3000.0)
 
     assert port.history == [pe1, pe2]
-    assert port.current_dt == later_dt
+    assert port.current_dt == LATER_DT
 
 
 def test_withdraw_funds_behaviour():
@@ -114,283 +167,188 @@ def test_withdraw_funds_behaviour():
     Test withdraw_funds correctly subtracts positive
     amount, generates correct event and modifies time
     """
-    start_dt = pd.Timestamp('2017-10-05 08:00:00', tz=pytz.UTC)
-    earlier_dt = pd.Timestamp('2017-10-04 08:00:00', tz=pytz.UTC)
-    later_dt = pd.Timestamp('2017-10-06 08:00:00', tz=pytz.UTC)
-    even_later_dt = pd.Timestamp('2017-10-07 08:00:00', tz=pytz.UTC)
     pos_cash = 1000.0
     neg_cash = -1000.0
-    port_raise = Portfolio(start_dt)
+    port_raise = Portfolio(START_DT)
 
     # Test withdraw_funds raises for incorrect datetime
     with pytest.raises(ValueError):
-        port_raise.withdraw_funds(earlier_dt, pos_cash)
+        port_raise.withdraw_funds(EARLIER_DT, pos_cash)
 
     # Test withdraw_funds raises for negative amount
     with pytest.raises(ValueError):
-        port_raise.withdraw_funds(start_dt, neg_cash)
+        port_raise.withdraw_funds(START_DT, neg_cash)
 
     # Test withdraw_funds raises for not enough cash
-    port_broke = Portfolio(start_dt)
-    port_broke.subscribe_funds(later_dt, 1000.0)
+    port_broke = Portfolio(START_DT)
+    port_broke.subscribe_funds(LATER_DT, 1000.0)
 
     with pytest.raises(ValueError):
-        port_broke.withdraw_funds(later_dt, 2000.0)
+        port_broke.withdraw_funds(LATER_DT, 2000.0)
 
     # Test withdraw_funds correctly subtracts positive
     # amount, generates correct event and modifies time
     # Initial subscribe
-    port_cor = Portfolio(start_dt)
-    port_cor.subscribe_funds(later_dt, pos_cash)
-    pe_sub = PortfolioEvent(
-        dt=later_dt, type='subscription',
-        description="SUBSCRIPTION", debit=0.0,
-        credit=1000.0, balance=1000.0
-    )
-    assert port_cor.cash == 1000.0
-    assert port_cor.total_market_value == 0.0
-    assert port_cor.total_equity == 1000.0
+    port_cor = Portfolio(START_DT)
+    port_cor.subscribe_funds(LATER_DT, pos_cash)
+    pe_sub = LATER_SUB_EVENT
+    _assert_balances(port_cor, 1000.0, 0.0, 1000.0)
     assert port_cor.history == [pe_sub]
-    assert port_cor.current_dt == later_dt
+    assert port_cor.current_dt == LATER_DT
 
     # Now withdraw
-    port_cor.withdraw_funds(even_later_dt, 468.0)
-    pe_wdr = PortfolioEvent(
-        dt=even_later_dt, type='withdrawal',
-        description="WITHDRAWAL", debit=468.0,
-        credit=0.0, balance=532.0
-    )
-    assert port_cor.cash == 532.0
-    assert port_cor.total_market_value == 0.0
-    assert port_cor.total_equity == 532.0
+    port_cor.withdraw_funds(EVEN_LATER_DT, 468.0)
+    pe_wdr = _wdr_event(EVEN_LATER_DT, 468.0, 532.0)
+    _assert_balances(port_cor, 532.0, 0.0, 532.0)
     assert port_cor.history == [pe_sub, pe_wdr]
-    assert port_cor.current_dt == even_later_dt
+    assert port_cor.current_dt == EVEN_LATER_DT
 
 
-def test_transact_asset_behaviour():
+def test_transact_asset_behaviour(port, asset):
     """
     Test transact_asset raises for incorrect time
     Test correct total_cash and total_securities_value
     for correct transaction (commission etc), correct
     portfolio event and correct time update
     """
-    start_dt = pd.Timestamp('2017-10-05 08:00:00', tz=pytz.UTC)
-    earlier_dt = pd.Timestamp('2017-10-04 08:00:00', tz=pytz.UTC)
-    later_dt = pd.Timestamp('2017-10-06 08:00:00', tz=pytz.UTC)
-    even_later_dt = pd.Timestamp('2017-10-07 08:00:00', tz=pytz.UTC)
-    port = Portfolio(start_dt)
-    asset = 'EQ:AAA'
-
     # Test transact_asset raises for incorrect time
-    tn_early = Transaction(
-        asset=asset,
-        quantity=100,
-        dt=earlier_dt,
-        price=567.0,
-        order_id=1,
-        commission=0.0
-    )
+    tn_early = _tx(asset, EARLIER_DT, commission=0.0)
     with pytest.raises(ValueError):
         port.transact_asset(tn_early)
 
     # Test transact_asset raises for transaction total
     # cost exceeding total cash
-    port.subscribe_funds(later_dt, 1000.0)
+    port.subscribe_funds(LATER_DT, 1000.0)
 
-    assert port.cash == 1000.0
-    assert port.total_market_value == 0.0
-    assert port.total_equity == 1000.0
+    _assert_balances(port, 1000.0, 0.0, 1000.0)
 
-    pe_sub1 = PortfolioEvent(
-        dt=later_dt, type='subscription',
-        description="SUBSCRIPTION", debit=0.0,
-        credit=1000.0, balance=1000.0
-    )
+    pe_sub1 = LATER_SUB_EVENT
 
     # Test correct total_cash and total_securities_value
     # for correct transaction (commission etc), correct
     # portfolio event and correct time update
-    port.subscribe_funds(even_later_dt, 99000.0)
+    port.subscribe_funds(EVEN_LATER_DT, 99000.0)
 
-    assert port.cash == 100000.0
-    assert port.total_market_value == 0.0
-    assert port.total_equity == 100000.0
+    _assert_balances(port, 100000.0, 0.0, 100000.0)
 
-    pe_sub2 = PortfolioEvent(
-        dt=even_later_dt, type='subscription',
-        description="SUBSCRIPTION", debit=0.0,
-        credit=99000.0, balance=100000.0
-    )
-    tn_even_later = Transaction(
-        asset=asset,
-        quantity=100,
-        dt=even_later_dt,
-        price=567.0,
-        order_id=1,
-        commission=15.78
-    )
+    pe_sub2 = _sub_event(EVEN_LATER_DT, 99000.0, 100000.0)
+    tn_even_later = _tx(asset, EVEN_LATER_DT)
     port.transact_asset(tn_even_later)
 
-    assert port.cash == 43284.22
-    assert port.total_market_value == 56700.00
-    assert port.total_equity == 99984.22
+    _assert_balances(port, 43284.22, 56700.00, 99984.22)
 
     description = "LONG 100 EQ:AAA 567.00 07/10/2017"
     pe_tn = PortfolioEvent(
-        dt=even_later_dt, type="asset_transaction",
+        dt=EVEN_LATER_DT, type="asset_transaction",
         description=description, debit=56715.78,
         credit=0.0, balance=43284.22
     )
 
     assert port.history == [pe_sub1, pe_sub2, pe_tn]
-    assert port.current_dt == even_later_dt
+    assert port.current_dt == EVEN_LATER_DT
 
 
-def test_portfolio_to_dict_empty_portfolio():
+def test_portfolio_to_dict_empty_portfolio(port):
     """
     Test 'portfolio_to_dict' method for an empty Portfolio.
     """
-    start_dt = pd.Timestamp('2017-10-05 08:00:00', tz=pytz.UTC)
-    port = Portfolio(start_dt)
-    port.subscribe_funds(start_dt, 100000.0)
+    port.subscribe_funds(START_DT, 100000.0)
     port_dict = port.portfolio_to_dict()
     assert port_dict == {}
 
 
-def test_portfolio_to_dict_for_two_holdings():
+_EXPECTED_TWO_HOLDINGS = {
+    'EQ:AAA': {
+        "quantity": 100,
+        "market_value": 56700.0,
+        "unrealised_pnl": -15.78,
+        "realised_pnl": 0.0,
+        "total_pnl": -15.78
+    },
+    'EQ:BBB': {
+        "quantity": 100,
+        "market_value": 13400.0,
+        "unrealised_pnl": 1092.3600000000006,
+        "realised_pnl": 0.0,
+        "total_pnl": 1092.3600000000006
+    }
+}
+
+
+def test_portfolio_to_dict_for_two_holdings(asset, other_asset):
     """
     Test portfolio_to_dict for two holdings.
     """
-    start_dt = pd.Timestamp('2017-10-05 08:00:00', tz=pytz.UTC)
-    asset1_dt = pd.Timestamp('2017-10-06 08:00:00', tz=pytz.UTC)
-    asset2_dt = pd.Timestamp('2017-10-07 08:00:00', tz=pytz.UTC)
-    update_dt = pd.Timestamp('2017-10-08 08:00:00', tz=pytz.UTC)
-    asset1 = 'EQ:AAA'
-    asset2 = 'EQ:BBB'
-
-    port = Portfolio(start_dt, portfolio_id='1234')
-    port.subscribe_funds(start_dt, 100000.0)
-    tn_asset1 = Transaction(
-        asset=asset1, quantity=100, dt=asset1_dt,
-        price=567.0, order_id=1, commission=15.78
-    )
+    asset1 = asset
+    asset2 = other_asset
+
+    port = Portfolio(START_DT, portfolio_id='1234')
+    port.subscribe_funds(START_DT, 100000.0)
+    tn_asset1 = _tx(asset1, ASSET1_DT)
     port.transact_asset(tn_asset1)
 
-    tn_asset2 = Transaction(
-        asset=asset2, quantity=100, dt=asset2_dt,
-        price=123.0, order_id=2, commission=7.64
+    tn_asset2 = _tx(
+        asset2, ASSET2_DT, price=123.0, commission=7.64, order_id=2
     )
     port.transact_asset(tn_asset2)
-    port.update_market_value_of_asset(asset2, 134.0, update_dt)
-    test_holdings = {
-        asset1: {
-            "quantity": 100,
-            "market_value": 56700.0,
-            "unrealised_pnl": -15.78,
-            "realised_pnl": 0.0,
-            "total_pnl": -15.78
-        },
-        asset2: {
-            "quantity": 100,
-            "market_value": 13400.0,
-            "unrealised_pnl": 1092.3600000000006,
-            "realised_pnl": 0.0,
-            "total_pnl": 1092.3600000000006
-        }
-    }
+    port.update_market_value_of_asset(asset2, 134.0, UPDATE_DT)
     port_holdings = port.portfolio_to_dict()
 
     # This is needed because we're not using Decimal
     # datatypes and have to compare slightly differing
     # floating point representations
-    for asset in (asset1, asset2):
-        for key, val in test_holdings[asset].items():
-            assert port_holdings[asset][key] == pytest.approx(
-                test_holdings[asset][key]
-            )
+    for symbol, expected in _EXPECTED_TWO_HOLDINGS.items():
+        for key, val in expected.items():
+            assert port_holdings[symbol][key] == approx(val)
 
 
-def test_update_market_value_of_asset_not_in_list():
+def test_update_market_value_of_asset_not_in_list(port, asset):
     """
     Test update_market_value_of_asset for asset not in list.
     """
-    start_dt = pd.Timestamp('2017-10-05 08:00:00', tz=pytz.UTC)
-    later_dt = pd.Timestamp('2017-10-06 08:00:00', tz=pytz.UTC)
-    port = Portfolio(start_dt)
-    asset = 'EQ:AAA'
     update = port.update_market_value_of_asset(
-        asset, 54.34, later_dt
+        asset, 54.34, LATER_DT
     )
     assert update is None
 
 
-def test_update_market_value_of_asset_negative_price():
-    """
-    Test update_market_value_of_asset for
-    asset with negative price.
-    """
-    start_dt = pd.Timestamp('2017-10-05 08:00:00', tz=pytz.UTC)
-    later_dt = pd.Timestamp('2017-10-06 08:00:00', tz=pytz.UTC)
-    port = Portfolio(start_dt)
-
-    asset = 'EQ:AAA'
-    port.subscribe_funds(later_dt, 100000.0)
-    tn_asset = Transaction(
-        asset=asset,
-        quantity=100,
-        dt=later_dt,
-        price=567.0,
-        order_id=1,
-        commission=15.78
-    )
+@pytest.fixture(scope="class")
+def port_with_asset(asset):
+    port = Portfolio(START_DT, portfolio_id='1234')
+    port.subscribe_funds(LATER_DT, 100000.0)
+    tn_asset = _tx(asset, LATER_DT)
     port.transact_asset(tn_asset)
-    with pytest.raises(ValueError):
-        port.update_market_value_of_asset(
-            asset, -54.34, later_dt
-        )
+    return port
 
 
-def test_update_market_value_of_asset_earlier_date():
+class TestUpdateMarketValueErrors(object):
     """
-    Test update_market_value_of_asset for asset
-    with current_trade_date in past
+    Test update_market_value_of_asset raises for an asset
+    with a negative price or a current_trade_date in the past.
     """
-    start_dt = pd.Timestamp('2017-10-05 08:00:00', tz=pytz.UTC)
-    earlier_dt = pd.Timestamp('2017-10-04 08:00:00', tz=pytz.UTC)
-    later_dt = pd.Timestamp('2017-10-06 08:00:00', tz=pytz.UTC)
-    port = Portfolio(start_dt, portfolio_id='1234')
-
-    asset = 'EQ:AAA'
-    port.subscribe_funds(later_dt, 100000.0)
-    tn_asset = Transaction(
-        asset=asset,
-        quantity=100,
-        dt=later_dt,
-        price=567.0,
-        order_id=1,
-        commission=15.78
+
+    @pytest.mark.parametrize(
+        "price,dt",
+        [
+            (-54.34, LATER_DT),
+            (50.23, EARLIER_DT)
+        ],
+        ids=["negative_price", "earlier_date"]
     )
-    port.transact_asset(tn_asset)
-    with pytest.raises(ValueError):
-        port.update_market_value_of_asset(
-            asset, 50.23, earlier_dt
-        )
+    def test_update_market_value_of_asset_raises(
+        self, port_with_asset, asset, price, dt
+    ):
+        with pytest.raises(ValueError):
+            port_with_asset.update_market_value_of_asset(asset, price, dt)
 
 
-def test_history_to_df_empty():
+def test_history_to_df_empty(port):
     """
     Test 'history_to_df' with no events.
     """
-    start_dt = pd.Timestamp('2017-10-05 08:00:00', tz=pytz.UTC)
-    port = Portfolio(start_dt)
     hist_df = port.history_to_df()
-    test_df = pd.DataFrame(
-        [], columns=[
-            "date", "type", "description",
-            "debit", "credit", "balance"
-        ]
-    )
-    test_df.set_index(keys=["date"], inplace=True)
-    assert sorted(test_df.columns) == sorted(hist_df.columns)
-    assert len(test_df) == len(hist_df)
-    assert len(hist_df) == 0
+    assert hist_df.empty
+    assert set(hist_df.columns) == {
+        "type", "description", "debit", "credit", "balance"
+    }
+    assert hist_df.index.name == "date"
@@ -0,0 +1,97 @@
+import pandas as pd
+import pytz
+import pytest
+
+from qstrader.broker.portfolio.portfolio import Portfolio
+from qstrader.broker.transaction.transaction import Transaction
+
+
+pytest.importorskip("pytest_benchmark")
+
+
+UTC = pytz.UTC
+
+START_DT = pd.Timestamp('2017-10-05 08:00:00', tz=UTC)
+LATER_DT = pd.Timestamp('2017-10-06 08:00:00', tz=UTC)
+
+ROUNDS = 20
+
+WORKLOADS = [
+    (1, 1),
+    (100, 1),
+    (100, 10),
+    (1000, 100)
+]
+
+
+def _build_transactions(n_txns, n_assets):
+    """
+    Create 'n_txns' Transactions spread round-robin
+    across 'n_assets' distinct asset symbols.
+    """
+    return [
+        Transaction(
+            asset='EQ:%04d' % (i % n_assets),
+            quantity=100,
+            dt=LATER_DT,
+            price=567.0,
+            order_id=i,
+            commission=15.78
+        ) for i in range(n_txns)
+    ]
+
+
+def _build_portfolio(txns):
+    """
+    Create a funded Portfolio that has carried out 'txns'.
+    """
+    port = Portfolio(START_DT, starting_cash=1e9)
+    for txn in txns:
+        port.transact_asset(txn)
+    return port
+
+
+@pytest.mark.parametrize("n_subs", [1, 100, 1000])
+def test_subscribe_funds_throughput(benchmark, n_subs):
+    """
+    Benchmark 'n_subs' successive calls to subscribe_funds
+    against a fresh Portfolio on each round.
+    """
+    def setup():
+        return (Portfolio(START_DT),), {}
+
+    def run(port):
+        for _ in range(n_subs):
+            port.subscribe_funds(LATER_DT, 1000.0)
+
+    benchmark.pedantic(run, setup=setup, rounds=ROUNDS)
+
+
+@pytest.mark.parametrize("n_txns,n_assets", WORKLOADS)
+def test_transact_asset_throughput(benchmark, n_txns, n_assets):
+    """
+    Benchmark carrying out 'n_txns' prebuilt Transactions across
+    'n_assets' assets against a fresh Portfolio on each round.
+    """
+    txns = _build_transactions(n_txns, n_assets)
+
+    def setup():
+        return (Portfolio(START_DT, starting_cash=1e9),), {}
+
+    def run(port):
+        for txn in txns:
+            port.transact_asset(txn)
+
+    benchmark.pedantic(run, setup=setup, rounds=ROUNDS)
+
+
+@pytest.mark.parametrize("n_txns,n_assets", WORKLOADS)
+def test_portfolio_to_dict_throughput(benchmark, n_txns, n_assets):
+    """
+    Benchmark portfolio_to_dict for a Portfolio holding
+    'n_assets' positions built from 'n_txns' Transactions.
+    """
+    port = _build_portfolio(_build_transactions(n_txns, n_assets))
+
+    holdings = benchmark(port.portfolio_to_dict)
+    assert len(holdings) == n_assets